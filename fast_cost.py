@@ -0,0 +1,705 @@
+import math
+
+import numpy as np
+from numba import njit, prange
+
+# ==========================================
+# STAŁE SIATKI (8 SĄSIADÓW)
+# ==========================================
+
+# Przesunięcia (wiersz, kolumna) do 8 sąsiadów komórki.
+# Tablica jest symetryczna: kierunek 7 - k jest przeciwny do kierunku k.
+DR = np.array([-1, -1, -1, 0, 0, 1, 1, 1], dtype=np.int64)
+DC = np.array([-1, 0, 1, -1, 1, -1, 0, 1], dtype=np.int64)
+
+SQRT2 = math.sqrt(2.0)
+
+# Flagi fastmath bez założeń "brak NaN/Inf" - NaN i Inf oznaczają tu brak danych i przeszkody
+FASTMATH = {"nsz", "arcp", "contract", "afn", "reassoc"}
+
+# Kwantyzacja kosztu komórki dla jąder Dijkstry: koszt * COST_SCALE -> int32
+COST_SCALE = 1000.0
+INT32_MAX = np.iinfo(np.int32).max
+# Koszt skwantyzowany komórki nieprzekraczalnej (NoData, Inf)
+IMPASSABLE = -1
+# Odległość komórki jeszcze nieosiągniętej (tablice odległości int64)
+UNREACHED = np.iinfo(np.int64).max
+# Górny limit liczby kubełków; powyżej używany jest kopiec binarny. Dial jest wybierany,
+# gdy ceil(2 * sqrt(2) * koszt_max * COST_SCALE) + 1 < DIAL_MAX_BUCKETS, czyli dla
+# kosztu komórki do ok. 2**16 / 2828 = 23.2 (teren z nachyleniem, wiatrem i niską
+# roślinnością). Kara za budynki (domyślnie 1000) zawsze wybiera kopiec. Pierścień
+# jest celowo mały: 2**16 głów list int32 (256 KB na front) mieści się w pamięci L2,
+# a przy większym zakresie kosztów przeglądanie pustych kubełków zjada zysk z Dial.
+DIAL_MAX_BUCKETS = 1 << 16
+
+# Pula tablic roboczych algorytmu Dijkstry: kształt rastra -> {nazwa: tablica}.
+# Kolejne trasy na tym samym rastrze nie alokują pamięci od nowa. Pula przechowuje
+# tylko ostatni kształt - proces ArcGIS Pro jest długowieczny, a tablice dla
+# dużego rastra zajmują setki MB.
+_BUF = {}
+
+
+# ==========================================
+# NACHYLENIE I EKSPOZYCJA TERENU
+# ==========================================
+
+def horn_gradient(dem, cell_size):
+    """
+    Oblicza spadki terenu dz/dx i dz/dy metodą Horna (okno 3x3), tak jak narzędzia
+    Slope i Aspect w ArcGIS: sąsiedzi bez danych (NaN) oraz leżący poza rastrem
+    otrzymują wartość komórki środkowej, więc komórki na granicy NoData mają poprawny
+    spadek. NaN pozostaje tylko tam, gdzie brak danych w samej komórce środkowej.
+    Oznaczenia okna:  a b c / d e f / g h i  (wiersz a-b-c leży od strony północnej).
+    """
+    z = np.pad(dem, 1, mode="constant", constant_values=np.nan)
+    e = dem
+
+    def neighbour(window):
+        return np.where(np.isnan(window), e, window)
+
+    a = neighbour(z[:-2, :-2])
+    b = neighbour(z[:-2, 1:-1])
+    c = neighbour(z[:-2, 2:])
+    d = neighbour(z[1:-1, :-2])
+    f = neighbour(z[1:-1, 2:])
+    g = neighbour(z[2:, :-2])
+    h = neighbour(z[2:, 1:-1])
+    i = neighbour(z[2:, 2:])
+    dzdx = ((c + 2.0 * f + i) - (a + 2.0 * d + g)) / (8.0 * cell_size)
+    dzdy = ((g + 2.0 * h + i) - (a + 2.0 * b + c)) / (8.0 * cell_size)
+    # Komórka środkowa bez danych - spadek nieokreślony, nawet gdy sąsiedzi mają dane
+    nodata = np.isnan(e)
+    dzdx[nodata] = np.nan
+    dzdy[nodata] = np.nan
+    return dzdx, dzdy
+
+
+def slope_from_gradient(dzdx, dzdy):
+    """Nachylenie terenu w stopniach (0-90)."""
+    return np.degrees(np.arctan(np.hypot(dzdx, dzdy)))
+
+
+def aspect_from_gradient(dzdx, dzdy):
+    """
+    Ekspozycja stoku w stopniach zgodnie z ruchem wskazówek zegara od północy (0-360).
+    Komórki płaskie otrzymują wartość -1, jak w narzędziu Aspect.
+    """
+    angle = np.degrees(np.arctan2(dzdy, -dzdx))
+    aspect = np.where(angle > 90.0, 450.0 - angle, 90.0 - angle)
+    aspect[(dzdx == 0.0) & (dzdy == 0.0)] = -1.0
+    return aspect
+
+
+# ==========================================
+# KOSZT PRZELOTU (JĄDRO RÓWNOLEGŁE)
+# ==========================================
+
+@njit(parallel=True, fastmath=FASTMATH, cache=True)
+def fuse_cost(dem, aspect, slope, veg, bmask, wind_speed, wind_deg, penalty, vp, out):
+    """
+    Oblicza koszt każdej komórki w jednym przejściu (wiersze rozdzielone między wątki):
+    klasa nachylenia (1, 2, 4, 8) * mnożnik wiatrowy * mnożnik roślinności * kara za budynki.
+    Komórki bez danych NMT albo z nieokreślonym nachyleniem lub ekspozycją (NaN) otrzymują
+    koszt nieskończony, tak jak NoData w CostDistance. Wynik trafia do tablicy out.
+    Tablica aspect jest czytana tylko przy wind_speed > 0 (w przeciwnym razie może być pusta).
+    """
+    rows, cols = dem.shape
+    for i in prange(rows):
+        for j in range(cols):
+            z = dem[i, j]
+            if not (np.isfinite(z) and np.isfinite(slope[i, j])):
+                out[i, j] = np.inf
+                continue
+            if wind_speed > 0.0 and not np.isfinite(aspect[i, j]):
+                out[i, j] = np.inf
+                continue
+
+            # Reklasyfikacja nachylenia bez rozgałęzień: 0-5° -> 1, 5-15° -> 2, 15-30° -> 4, > 30° -> 8
+            # (liczba przekroczonych progów jako wykładnik potęgi dwójki)
+            s = slope[i, j]
+            cost = float(1 << (np.int64(s > 5.0) + np.int64(s > 15.0) + np.int64(s > 30.0)))
+
+            # Wiatr wiejący prostopadle do zbocza zwiększa turbulencje
+            if wind_speed > 0.0:
+                angle_diff = abs((aspect[i, j] - wind_deg + 180.0) % 360.0 - 180.0)
+                cost *= max(0.6, 1.0 + (wind_speed / 15.0) * (angle_diff / 180.0))
+
+            # Wysokość roślinności (NMPT - NMT), brak danych lub wartość ujemna -> 0
+            height = veg[i, j] - z
+            if not height > 0.0:
+                height = 0.0
+            cost *= 1.0 + height * vp
+
+            if bmask[i, j] != 0:
+                cost *= penalty
+            out[i, j] = cost
+
+
+# ==========================================
+# KOLEJKA PRIORYTETOWA (KOPIEC BINARNY)
+# ==========================================
+
+@njit(cache=True)
+def heap_push(keys, vals, size, key, val):
+    """
+    Wstawia element do kopca binarnego zapisanego w dwóch równoległych tablicach
+    (keys - odległość kosztowa, vals - indeks komórki). Zwraca nowy rozmiar kopca.
+    """
+    i = size
+    keys[i] = key
+    vals[i] = val
+    # Przesuwanie elementu w górę, dopóki rodzic ma większy klucz
+    while i > 0:
+        parent = (i - 1) // 2
+        if keys[parent] <= keys[i]:
+            break
+        keys[parent], keys[i] = keys[i], keys[parent]
+        vals[parent], vals[i] = vals[i], vals[parent]
+        i = parent
+    return size + 1
+
+
+@njit(cache=True)
+def heap_pop(keys, vals, size):
+    """
+    Zdejmuje element o najmniejszym kluczu z kopca.
+    Zwraca krotkę (klucz, indeks komórki, nowy rozmiar kopca).
+    """
+    key = keys[0]
+    val = vals[0]
+    size -= 1
+    if size > 0:
+        keys[0] = keys[size]
+        vals[0] = vals[size]
+        # Przesuwanie elementu w dół, aż oba dzieci mają większe klucze
+        i = 0
+        while True:
+            left = 2 * i + 1
+            if left >= size:
+                break
+            child = left
+            if left + 1 < size and keys[left + 1] < keys[left]:
+                child = left + 1
+            if keys[i] <= keys[child]:
+                break
+            keys[child], keys[i] = keys[i], keys[child]
+            vals[child], vals[i] = vals[i], vals[child]
+            i = child
+    return key, val, size
+
+
+@njit(cache=True)
+def _grow(keys, vals):
+    """Podwaja pojemność tablic kopca (przy wielokrotnym wstawianiu tej samej komórki)."""
+    new_keys = np.empty(keys.shape[0] * 2, dtype=keys.dtype)
+    new_vals = np.empty(vals.shape[0] * 2, dtype=vals.dtype)
+    new_keys[: keys.shape[0]] = keys
+    new_vals[: vals.shape[0]] = vals
+    return new_keys, new_vals
+
+
+# ==========================================
+# KOLEJKA KUBEŁKOWA (DIAL)
+# ==========================================
+
+@njit(cache=True)
+def dial_insert(head, nxt, prv, bucket, v):
+    """
+    Wstawia komórkę v na początek listy kubełka. Listy są wbudowane w tablice
+    nxt/prv (jeden wpis na komórkę), więc nie ma żadnych alokacji.
+    """
+    first = head[bucket]
+    nxt[v] = first
+    prv[v] = -1
+    if first >= 0:
+        prv[first] = v
+    head[bucket] = v
+
+
+@njit(cache=True)
+def dial_remove(head, nxt, prv, bucket, v):
+    """Usuwa komórkę v z listy kubełka (np. przy zmniejszeniu jej odległości)."""
+    if prv[v] >= 0:
+        nxt[prv[v]] = nxt[v]
+    else:
+        head[bucket] = nxt[v]
+    if nxt[v] >= 0:
+        prv[nxt[v]] = prv[v]
+
+
+# ==========================================
+# KWANTYZACJA KOSZTÓW
+# ==========================================
+
+@njit(parallel=True, cache=True)
+def _quantize(cost, scale, out):
+    """round(koszt * scale) do int32; komórki nieprzekraczalne (NaN, Inf) -> IMPASSABLE."""
+    rows, cols = cost.shape
+    for i in prange(rows):
+        for j in range(cols):
+            value = cost[i, j]
+            if np.isfinite(value):
+                out[i, j] = np.int32(value * scale + 0.5)
+            else:
+                out[i, j] = IMPASSABLE
+
+
+def quantize_cost(cost):
+    """
+    Zamienia raster kosztów na liczby całkowite int32 (koszt * skala, zaokrąglony).
+    Skala wynosi COST_SCALE, chyba że największy koszt by się wtedy nie zmieścił
+    w int32 - wówczas jest odpowiednio zmniejszana. Zwraca (cost_q, skala).
+    Odległości liczone na cost_q są wyrażone w jednostkach cell_size / (2 * skala),
+    zob. dequantize_dist.
+    """
+    max_cost = _max_finite(cost)
+    scale = COST_SCALE
+    if max_cost * scale > INT32_MAX:
+        scale = INT32_MAX / max_cost
+    cost_q = np.empty(cost.shape, dtype=np.int32)
+    _quantize(cost, scale, cost_q)
+    return cost_q, scale
+
+
+def dequantize_dist(qdist, scale, cell_size, out=None):
+    """
+    Przelicza odległości całkowite (jądra na rastrze cost_q) na odległość kosztową
+    w jednostkach rastra kosztów; komórki nieosiągnięte (UNREACHED) -> Inf.
+    """
+    if out is None:
+        out = np.empty(qdist.shape, dtype=np.float64)
+    np.multiply(qdist, cell_size / (2.0 * scale), out=out)
+    out[qdist == UNREACHED] = np.inf
+    return out
+
+
+# ==========================================
+# RELAKSACJA KRAWĘDZI (WSTAWIANA W MIEJSCU WYWOŁANIA)
+# ==========================================
+
+# Funkcje są wstawiane w treść jąder (inline="always"), a przesunięcie sąsiada,
+# rodzaj kroku i kierunek powrotny są stałymi w miejscu wywołania - kompilator
+# generuje 8 niezależnych bloków relaksacji zamiast pętli po tablicach DR/DC.
+
+@njit(inline="always")
+def _edge_weight(cu, cv, diagonal):
+    """
+    Całkowity koszt krawędzi między komórkami o kosztach cu i cv: cu + cv dla kroku
+    prostego, (cu + cv) * √2 (zaokrąglone) dla przekątnej. Jednostką jest
+    cell_size / (2 * skala), więc w jądrach nie występuje rozmiar komórki.
+    """
+    w = np.int64(cu) + np.int64(cv)
+    if diagonal:
+        return np.int64(w * SQRT2 + 0.5)
+    return w
+
+
+@njit(inline="always")
+def _relax_heap(cost, dist, backlink, max_dist, keys, vals, size, d, cu, nr, nc, diagonal, back):
+    """Relaksacja krawędzi u -> (nr, nc) dla wariantu z kopcem binarnym."""
+    rows, cols = cost.shape
+    if nr < 0 or nr >= rows or nc < 0 or nc >= cols:
+        return keys, vals, size
+    cv = cost[nr, nc]
+    if cv < 0:
+        return keys, vals, size
+    nd = d + _edge_weight(cu, cv, diagonal)
+    if nd < dist[nr, nc] and nd <= max_dist:
+        dist[nr, nc] = nd
+        backlink[nr, nc] = back
+        if size == keys.shape[0]:
+            keys, vals = _grow(keys, vals)
+        size = heap_push(keys, vals, size, nd, nr * cols + nc)
+    return keys, vals, size
+
+
+@njit(inline="always")
+def _relax_dial(cost, qdist, backlink, in_queue, head, nxt, prv, n_buckets, count, current, cu, nr, nc, diagonal, back):
+    """Relaksacja krawędzi u -> (nr, nc) dla wariantu z kolejką kubełkową (Dial)."""
+    rows, cols = cost.shape
+    if nr < 0 or nr >= rows or nc < 0 or nc >= cols:
+        return count
+    cv = cost[nr, nc]
+    if cv < 0:
+        return count
+    nd = current + _edge_weight(cu, cv, diagonal)
+    v = nr * cols + nc
+    if nd < qdist[v]:
+        if in_queue[v]:
+            dial_remove(head, nxt, prv, qdist[v] % n_buckets, v)
+        else:
+            in_queue[v] = True
+            count += 1
+        qdist[v] = nd
+        backlink[nr, nc] = back
+        dial_insert(head, nxt, prv, nd % n_buckets, v)
+    return count
+
+
+# ==========================================
+# ALGORYTM DIJKSTRY NA RASTRZE KOSZTÓW
+# ==========================================
+
+@njit(cache=True)
+def _max_finite(cost):
+    """Zwraca największy skończony koszt komórki (0, jeśli brak takich komórek)."""
+    result = 0.0
+    for value in cost.flat:
+        if np.isfinite(value) and value > result:
+            result = value
+    return result
+
+
+def _max_edge_weight(cost_q):
+    """
+    Największy możliwy koszt krawędzi na rastrze cost_q (przekątna między dwiema
+    najdroższymi komórkami) - liczba kubełków kolejki Dial to ta wartość + 1.
+    """
+    return math.ceil(2 * int(cost_q.max()) * SQRT2) + 1
+
+
+def _pooled(shape, name, length, dtype):
+    """
+    Zwraca jednowymiarową tablicę roboczą o długości co najmniej length z puli _BUF
+    (kluczem puli jest kształt rastra; inny kształt opróżnia pulę). Tablica jest alokowana
+    tylko przy pierwszym użyciu lub gdy dotychczasowa jest za krótka albo innego typu;
+    jej zawartość nie jest zerowana.
+    """
+    if shape not in _BUF:
+        # Nowy kształt rastra - tablice poprzedniego są zwalniane
+        _BUF.clear()
+    pool = _BUF.setdefault(shape, {})
+    arr = pool.get(name)
+    if arr is None or arr.shape[0] < length or arr.dtype != dtype:
+        arr = np.empty(length, dtype=dtype)
+        pool[name] = arr
+    return arr[:length]
+
+
+@njit(cache=True, nogil=True)
+def heap_search(cost_q, dist, backlink, max_dist, keys, vals):
+    """
+    Algorytm Dijkstry z kopcem binarnym na rastrze skwantyzowanym, działający w miejscu
+    na tablicach dist (int64) i backlink. Źródłami są wszystkie komórki o znanej
+    odległości początkowej (różnej od UNREACHED). Koszt krawędzi jak w _edge_weight;
+    komórki IMPASSABLE są nieprzekraczalne, a odległości większe niż max_dist nie są
+    propagowane, więc przeszukiwany jest tylko obszar w zasięgu max_dist.
+    keys/vals to tablice kopca; zwracane są z powrotem, bo mogą zostać powiększone.
+    """
+    rows, cols = cost_q.shape
+
+    # Kopiec z leniwym usuwaniem: nieaktualne wpisy są pomijane przy zdejmowaniu
+    size = 0
+
+    for u in range(rows * cols):
+        d = dist[u // cols, u % cols]
+        if d != UNREACHED:
+            size = heap_push(keys, vals, size, d, u)
+
+    while size > 0:
+        d, u, size = heap_pop(keys, vals, size)
+        r = u // cols
+        c = u % cols
+        if d > dist[r, c]:
+            continue
+        cu = cost_q[r, c]
+        # 8 sąsiadów rozpisanych jawnie (kolejność jak w DR/DC); ostatni argument to
+        # kierunek z sąsiada z powrotem do u (7 - k)
+        keys, vals, size = _relax_heap(cost_q, dist, backlink, max_dist, keys, vals, size, d, cu, r - 1, c - 1, True, 7)
+        keys, vals, size = _relax_heap(cost_q, dist, backlink, max_dist, keys, vals, size, d, cu, r - 1, c, False, 6)
+        keys, vals, size = _relax_heap(cost_q, dist, backlink, max_dist, keys, vals, size, d, cu, r - 1, c + 1, True, 5)
+        keys, vals, size = _relax_heap(cost_q, dist, backlink, max_dist, keys, vals, size, d, cu, r, c - 1, False, 4)
+        keys, vals, size = _relax_heap(cost_q, dist, backlink, max_dist, keys, vals, size, d, cu, r, c + 1, False, 3)
+        keys, vals, size = _relax_heap(cost_q, dist, backlink, max_dist, keys, vals, size, d, cu, r + 1, c - 1, True, 2)
+        keys, vals, size = _relax_heap(cost_q, dist, backlink, max_dist, keys, vals, size, d, cu, r + 1, c, False, 1)
+        keys, vals, size = _relax_heap(cost_q, dist, backlink, max_dist, keys, vals, size, d, cu, r + 1, c + 1, True, 0)
+
+    return keys, vals
+
+
+@njit(cache=True)
+def trace_path(backlink, end_r, end_c):
+    """
+    Odtwarza ścieżkę od komórki końcowej do źródła, podążając za rastrem
+    kierunkowym (odpowiednik CostPathAsPolyline).
+    Zwraca tablice wierszy i kolumn kolejnych komórek, od źródła do końca.
+    """
+    rows, cols = backlink.shape
+    # Pierwsze przejście: liczba komórek ścieżki (z zabezpieczeniem przed pętlą)
+    n = 1
+    r = end_r
+    c = end_c
+    while backlink[r, c] >= 0 and n <= rows * cols:
+        k = backlink[r, c]
+        r += DR[k]
+        c += DC[k]
+        n += 1
+
+    path_r = np.empty(n, dtype=np.int64)
+    path_c = np.empty(n, dtype=np.int64)
+    r = end_r
+    c = end_c
+    for i in range(n - 1, -1, -1):
+        path_r[i] = r
+        path_c[i] = c
+        if i > 0:
+            k = backlink[r, c]
+            r += DR[k]
+            c += DC[k]
+    return path_r, path_c
+
+
+def cost_distance(cost, src_r, src_c, cell_size=1.0, max_cost=np.inf):
+    """
+    Oblicza odległość kosztową od komórek źródłowych (odpowiednik CostDistance
+    z rastrem kierunkowym CostBackLink). Skończone max_cost działa jak parametr
+    maximum_distance: przeszukiwanie jednym przebiegiem heap_search kończy się na
+    granicy zasięgu, więc czas zależy od obszaru w zasięgu max_cost, a nie od rozmiaru rastra.
+    Zwraca (dist, backlink): odległość kosztową (Inf poza zasięgiem i dla komórek
+    nieosiągalnych) oraz kierunek 0..7 do poprzednika (-1 dla źródła i komórek nieosiągniętych).
+    """
+    shape = cost.shape
+    n = shape[0] * shape[1]
+    cost_q, scale = quantize_cost(cost)
+    # max_cost w jednostkach odległości całkowitych (cell_size / (2 * skala))
+    max_dist = UNREACHED
+    if np.isfinite(max_cost):
+        max_dist = min(int(max_cost * 2.0 * scale / cell_size), UNREACHED)
+
+    qdist = _pooled(shape, "qdist_f", n, np.int64).reshape(shape)
+    qdist.fill(UNREACHED)
+    for r, c in zip(src_r, src_c):
+        if cost_q[r, c] >= 0:
+            qdist[r, c] = 0
+    backlink = np.full(shape, -1, dtype=np.int8)
+
+    pool = _BUF[shape]
+    pool["heap_keys"], pool["heap_vals"] = heap_search(
+        cost_q, qdist, backlink, max_dist,
+        _pooled(shape, "heap_keys", max(n, 16), np.int64),
+        _pooled(shape, "heap_vals", max(n, 16), np.int64),
+    )
+    return dequantize_dist(qdist, scale, cell_size), backlink
+
+
+# ==========================================
+# DWUKIERUNKOWY ALGORYTM DIJKSTRY (TRASA A -> B)
+# ==========================================
+
+def shortest_path(cost, start_rc, end_rc):
+    """
+    Wyznacza najtańszą ścieżkę między dwiema komórkami dwukierunkowym algorytmem
+    Dijkstry: przeszukiwanie biegnie jednocześnie od startu i od celu i kończy się,
+    gdy pierwsza komórka zostanie rozliczona przez oba fronty - zwykle po odwiedzeniu
+    około połowy komórek, które przejrzałby jednokierunkowy CostDistance.
+    Jądra pracują na skwantyzowanym rastrze (quantize_cost) i odległościach int64;
+    kolejką jest Dial, gdy największy koszt krawędzi jest mniejszy niż DIAL_MAX_BUCKETS
+    (koszt komórki do ok. 23, zob. komentarz tam), a w przeciwnym razie kopiec binarny.
+    Rozmiar komórki nie wpływa na przebieg ścieżki, więc nie jest parametrem.
+    Zwraca tablice wierszy i kolumn komórek ścieżki od startu do celu
+    lub None, jeśli cel jest nieosiągalny.
+    """
+    shape = cost.shape
+    n = shape[0] * shape[1]
+    cost_q, _ = quantize_cost(cost)
+    back_f = _pooled(shape, "backlink", n, np.int8).reshape(shape)
+    back_b = _pooled(shape, "backlink_b", n, np.int8).reshape(shape)
+    settled = _pooled(shape, "settled", n, np.int8)
+    qdist_f = _pooled(shape, "qdist_f", n, np.int64)
+    qdist_b = _pooled(shape, "qdist_b", n, np.int64)
+    back_f.fill(-1)
+    back_b.fill(-1)
+    settled.fill(0)
+    qdist_f.fill(UNREACHED)
+    qdist_b.fill(UNREACHED)
+
+    max_weight = _max_edge_weight(cost_q)
+    if max_weight < DIAL_MAX_BUCKETS:
+        # Listy kubełków przechowują indeksy komórek - int32 wystarcza do 2**31 komórek
+        index_dtype = np.int32 if n < 2**31 else np.int64
+        arrays = []
+        for side, qdist in (("f", qdist_f), ("b", qdist_b)):
+            in_queue = _pooled(shape, "in_queue_" + side, n, np.bool_)
+            head = _pooled(shape, "head_" + side, max_weight + 1, index_dtype)
+            in_queue.fill(False)
+            head.fill(-1)
+            arrays += [
+                qdist,
+                in_queue,
+                head,
+                _pooled(shape, "next_" + side, n, index_dtype),
+                _pooled(shape, "prev_" + side, n, index_dtype),
+            ]
+        meet = bidirectional_dial(
+            cost_q, start_rc[0], start_rc[1], end_rc[0], end_rc[1], max_weight,
+            back_f, back_b, settled, *arrays
+        )
+    else:
+        pool = _BUF[shape]
+        meet, pool["heap_keys"], pool["heap_vals"], pool["heap_keys_b"], pool["heap_vals_b"] = (
+            bidirectional_heap(
+                cost_q, start_rc[0], start_rc[1], end_rc[0], end_rc[1],
+                qdist_f.reshape(shape), back_f, qdist_b.reshape(shape), back_b, settled,
+                _pooled(shape, "heap_keys", max(n, 16), np.int64),
+                _pooled(shape, "heap_vals", max(n, 16), np.int64),
+                _pooled(shape, "heap_keys_b", max(n, 16), np.int64),
+                _pooled(shape, "heap_vals_b", max(n, 16), np.int64),
+            )
+        )
+
+    if meet < 0:
+        return None
+    # Start -> komórka spotkania po rastrze kierunkowym frontu startowego,
+    # komórka spotkania -> cel po rastrze frontu celu (bez powtórzenia komórki spotkania)
+    rows_f, cols_f = trace_path(back_f, meet // shape[1], meet % shape[1])
+    rows_b, cols_b = trace_path(back_b, meet // shape[1], meet % shape[1])
+    return (
+        np.concatenate((rows_f, rows_b[::-1][1:])),
+        np.concatenate((cols_f, cols_b[::-1][1:])),
+    )
+
+
+@njit(cache=True)
+def bidirectional_heap(
+    cost_q, start_r, start_c, end_r, end_c,
+    dist_f, back_f, dist_b, back_b, settled, keys_f, vals_f, keys_b, vals_b
+):
+    """
+    Dwukierunkowy Dijkstra z dwoma kopcami binarnymi. W każdym kroku rozwijany jest
+    front o mniejszej liczbie wpisów w kolejce. settled: bit 1 - komórka rozliczona od
+    startu, bit 2 - od celu. Zwraca indeks komórki spotkania (-1, jeśli brak ścieżki)
+    oraz tablice kopców (mogły zostać powiększone).
+    """
+    rows, cols = cost_q.shape
+    size_f = 0
+    size_b = 0
+    if cost_q[start_r, start_c] >= 0 and cost_q[end_r, end_c] >= 0:
+        dist_f[start_r, start_c] = 0
+        size_f = heap_push(keys_f, vals_f, size_f, 0, start_r * cols + start_c)
+        dist_b[end_r, end_c] = 0
+        size_b = heap_push(keys_b, vals_b, size_b, 0, end_r * cols + end_c)
+
+    while size_f > 0 and size_b > 0:
+        forward = size_f <= size_b
+        if forward:
+            dist, back, keys, vals, size, bit = dist_f, back_f, keys_f, vals_f, size_f, 1
+        else:
+            dist, back, keys, vals, size, bit = dist_b, back_b, keys_b, vals_b, size_b, 2
+
+        d, u, size = heap_pop(keys, vals, size)
+        r = u // cols
+        c = u % cols
+        met = False
+        if d <= dist[r, c]:
+            settled[u] |= bit
+            met = settled[u] == 3
+            if not met:
+                cu = cost_q[r, c]
+                keys, vals, size = _relax_heap(cost_q, dist, back, UNREACHED, keys, vals, size, d, cu, r - 1, c - 1, True, 7)
+                keys, vals, size = _relax_heap(cost_q, dist, back, UNREACHED, keys, vals, size, d, cu, r - 1, c, False, 6)
+                keys, vals, size = _relax_heap(cost_q, dist, back, UNREACHED, keys, vals, size, d, cu, r - 1, c + 1, True, 5)
+                keys, vals, size = _relax_heap(cost_q, dist, back, UNREACHED, keys, vals, size, d, cu, r, c - 1, False, 4)
+                keys, vals, size = _relax_heap(cost_q, dist, back, UNREACHED, keys, vals, size, d, cu, r, c + 1, False, 3)
+                keys, vals, size = _relax_heap(cost_q, dist, back, UNREACHED, keys, vals, size, d, cu, r + 1, c - 1, True, 2)
+                keys, vals, size = _relax_heap(cost_q, dist, back, UNREACHED, keys, vals, size, d, cu, r + 1, c, False, 1)
+                keys, vals, size = _relax_heap(cost_q, dist, back, UNREACHED, keys, vals, size, d, cu, r + 1, c + 1, True, 0)
+
+        if forward:
+            keys_f, vals_f, size_f = keys, vals, size
+        else:
+            keys_b, vals_b, size_b = keys, vals, size
+        if met:
+            break
+
+    # Najkrótsza ścieżka przechodzi przez komórkę o najmniejszej sumie odległości z obu
+    # frontów (nie musi to być komórka, na której fronty się spotkały)
+    meet = -1
+    best = UNREACHED
+    for u in range(rows * cols):
+        df = dist_f[u // cols, u % cols]
+        db = dist_b[u // cols, u % cols]
+        if df != UNREACHED and db != UNREACHED and df + db < best:
+            best = df + db
+            meet = u
+    return meet, keys_f, vals_f, keys_b, vals_b
+
+
+@njit(cache=True)
+def bidirectional_dial(
+    cost_q, start_r, start_c, end_r, end_c, max_weight, back_f, back_b, settled,
+    qdist_f, in_queue_f, head_f, nxt_f, prv_f, qdist_b, in_queue_b, head_b, nxt_b, prv_b
+):
+    """
+    Dwukierunkowy Dijkstra z dwiema monotonicznymi kolejkami kubełkowymi (Dial), zasady
+    jak w bidirectional_heap. Kubełki tworzą tablicę cykliczną o rozmiarze max_weight + 1:
+    wszystkie odległości w kolejce mieszczą się w przedziale [bieżąca, bieżąca + max_weight],
+    więc wyszukiwanie minimum przesuwa się wyłącznie do przodu.
+    Tablice robocze przygotowuje wywołujący: qdist = UNREACHED, in_queue = False, head = -1.
+    Zwraca indeks komórki spotkania (-1, jeśli brak ścieżki).
+    """
+    rows, cols = cost_q.shape
+    n_buckets = max_weight + 1
+    count_f = 0
+    count_b = 0
+    current_f = 0
+    current_b = 0
+    if cost_q[start_r, start_c] >= 0 and cost_q[end_r, end_c] >= 0:
+        u = start_r * cols + start_c
+        qdist_f[u] = 0
+        in_queue_f[u] = True
+        dial_insert(head_f, nxt_f, prv_f, 0, u)
+        count_f = 1
+        u = end_r * cols + end_c
+        qdist_b[u] = 0
+        in_queue_b[u] = True
+        dial_insert(head_b, nxt_b, prv_b, 0, u)
+        count_b = 1
+
+    while count_f > 0 and count_b > 0:
+        forward = count_f <= count_b
+        if forward:
+            qdist, back, in_queue, head, nxt, prv = qdist_f, back_f, in_queue_f, head_f, nxt_f, prv_f
+            count, current, bit = count_f, current_f, 1
+        else:
+            qdist, back, in_queue, head, nxt, prv = qdist_b, back_b, in_queue_b, head_b, nxt_b, prv_b
+            count, current, bit = count_b, current_b, 2
+
+        while head[current % n_buckets] < 0:
+            current += 1
+        bucket = current % n_buckets
+        u = head[bucket]
+        dial_remove(head, nxt, prv, bucket, u)
+        in_queue[u] = False
+        count -= 1
+
+        settled[u] |= bit
+        met = settled[u] == 3
+        if not met:
+            r = u // cols
+            c = u % cols
+            cu = cost_q[r, c]
+            count = _relax_dial(cost_q, qdist, back, in_queue, head, nxt, prv, n_buckets, count, current, cu, r - 1, c - 1, True, 7)
+            count = _relax_dial(cost_q, qdist, back, in_queue, head, nxt, prv, n_buckets, count, current, cu, r - 1, c, False, 6)
+            count = _relax_dial(cost_q, qdist, back, in_queue, head, nxt, prv, n_buckets, count, current, cu, r - 1, c + 1, True, 5)
+            count = _relax_dial(cost_q, qdist, back, in_queue, head, nxt, prv, n_buckets, count, current, cu, r, c - 1, False, 4)
+            count = _relax_dial(cost_q, qdist, back, in_queue, head, nxt, prv, n_buckets, count, current, cu, r, c + 1, False, 3)
+            count = _relax_dial(cost_q, qdist, back, in_queue, head, nxt, prv, n_buckets, count, current, cu, r + 1, c - 1, True, 2)
+            count = _relax_dial(cost_q, qdist, back, in_queue, head, nxt, prv, n_buckets, count, current, cu, r + 1, c, False, 1)
+            count = _relax_dial(cost_q, qdist, back, in_queue, head, nxt, prv, n_buckets, count, current, cu, r + 1, c + 1, True, 0)
+
+        if forward:
+            count_f, current_f = count, current
+        else:
+            count_b, current_b = count, current
+        if met:
+            break
+
+    meet = -1
+    best = UNREACHED
+    for u in range(rows * cols):
+        if qdist_f[u] != UNREACHED and qdist_b[u] != UNREACHED:
+            total = qdist_f[u] + qdist_b[u]
+            if total < best:
+                best = total
+                meet = u
+    return meet
@@ -0,0 +1,157 @@
+import math
+
+import cupy as cp
+import numpy as np
+from numba import cuda
+
+from fast_cost import DC, DR, SQRT2
+
+# Rozmiar bloku wątków CUDA (wiersze x kolumny)
+THREADS = (16, 16)
+
+
+# ==========================================
+# JĄDRA CUDA (DELTA-STEPPING)
+# ==========================================
+
+@cuda.jit
+def _relax_kernel(
+    cost, dist, frontier, next_frontier, settled, upper, delta, cell_size, max_cost, light, changed
+):
+    """
+    Jedna równoległa runda relaksacji krawędzi (jeden wątek na komórkę).
+    light=True: komórki z frontu o odległości < upper relaksują krawędzie lekkie (<= delta).
+    light=False: komórki rozliczone w bieżącym kubełku relaksują krawędzie ciężkie (> delta).
+    Odległości większe niż max_cost nie są zapisywane (komórka pozostaje poza zasięgiem).
+    """
+    r, c = cuda.grid(2)
+    rows, cols = cost.shape
+    if r >= rows or c >= cols:
+        return
+
+    if light:
+        if frontier[r, c] == 0 or dist[r, c] >= upper:
+            return
+        frontier[r, c] = 0
+        settled[r, c] = 1
+    else:
+        if settled[r, c] == 0:
+            return
+        settled[r, c] = 0
+
+    d = dist[r, c]
+    cu = cost[r, c]
+    for k in range(8):
+        nr = r + DR[k]
+        nc = c + DC[k]
+        if nr < 0 or nr >= rows or nc < 0 or nc >= cols:
+            continue
+        cv = cost[nr, nc]
+        if math.isinf(cv) or math.isnan(cv):
+            continue
+        geo = cell_size * SQRT2 if DR[k] != 0 and DC[k] != 0 else cell_size
+        w = 0.5 * (cu + cv) * geo
+        if (w <= delta) != light:
+            continue
+        nd = d + w
+        if nd > max_cost:
+            continue
+        if nd < dist[nr, nc]:
+            old = cuda.atomic.min(dist, (nr, nc), nd)
+            if nd < old:
+                next_frontier[nr, nc] = 1
+                changed[0] = 1
+
+
+@cuda.jit
+def _backlink_kernel(cost, dist, backlink, cell_size):
+    """
+    Odtwarza raster kierunkowy z ustalonych odległości: poprzednikiem komórki jest
+    sąsiad o mniejszej odległości minimalizujący dist[u] + koszt krawędzi.
+    """
+    r, c = cuda.grid(2)
+    rows, cols = cost.shape
+    if r >= rows or c >= cols:
+        return
+
+    dv = dist[r, c]
+    backlink[r, c] = -1
+    if math.isinf(dv) or dv == 0.0:
+        return
+
+    cv = cost[r, c]
+    best = math.inf
+    for k in range(8):
+        nr = r + DR[k]
+        nc = c + DC[k]
+        if nr < 0 or nr >= rows or nc < 0 or nc >= cols:
+            continue
+        du = dist[nr, nc]
+        if not du < dv:
+            continue
+        geo = cell_size * SQRT2 if DR[k] != 0 and DC[k] != 0 else cell_size
+        candidate = du + 0.5 * (cost[nr, nc] + cv) * geo
+        if candidate < best:
+            best = candidate
+            backlink[r, c] = k
+
+
+# ==========================================
+# FUNKCJA STERUJĄCA PO STRONIE HOSTA
+# ==========================================
+
+def dijkstra_cuda(cost, src_r, src_c, cell_size=1.0, max_cost=math.inf):
+    """
+    Oblicza odległość kosztową na GPU algorytmem delta-stepping (Meyer & Sanders).
+    Interfejs i wynik (dist, backlink) są takie same jak fast_cost.cost_distance,
+    łącznie z ograniczeniem zasięgu do max_cost (Inf poza zasięgiem).
+    Szerokość kubełka delta to średni koszt krawędzi rastra.
+    """
+    rows, cols = cost.shape
+    d_cost = cp.asarray(cost, dtype=cp.float64)
+    dist = cp.full((rows, cols), cp.inf, dtype=cp.float64)
+    frontier = cp.zeros((rows, cols), dtype=cp.uint8)
+    next_frontier = cp.zeros((rows, cols), dtype=cp.uint8)
+    settled = cp.zeros((rows, cols), dtype=cp.uint8)
+    changed = cp.zeros(1, dtype=cp.int32)
+
+    for r, c in zip(src_r, src_c):
+        if np.isfinite(cost[r, c]):
+            dist[r, c] = 0.0
+            frontier[r, c] = 1
+
+    # Średni koszt krawędzi (średnia z krawędzi prostych i przekątnych)
+    finite = d_cost[cp.isfinite(d_cost)]
+    mean_cost = float(finite.mean()) if finite.size else 1.0
+    delta = mean_cost * cell_size * (1.0 + SQRT2) / 2.0
+
+    blocks = (math.ceil(rows / THREADS[0]), math.ceil(cols / THREADS[1]))
+
+    while True:
+        # Najmniejszy niepusty kubełek wśród komórek frontu
+        lowest = float(cp.where(frontier != 0, dist, cp.inf).min())
+        if math.isinf(lowest):
+            break
+        upper = (math.floor(lowest / delta) + 1) * delta
+
+        # Krawędzie lekkie: powtarzanie, aż kubełek się ustabilizuje
+        while True:
+            changed[0] = 0
+            _relax_kernel[blocks, THREADS](
+                d_cost, dist, frontier, next_frontier, settled, upper, delta, cell_size, max_cost, True, changed
+            )
+            frontier |= next_frontier
+            next_frontier[:] = 0
+            if int(changed[0]) == 0:
+                break
+
+        # Krawędzie ciężkie: jednorazowo z komórek rozliczonych w tym kubełku
+        _relax_kernel[blocks, THREADS](
+            d_cost, dist, frontier, next_frontier, settled, upper, delta, cell_size, max_cost, False, changed
+        )
+        frontier |= next_frontier
+        next_frontier[:] = 0
+
+    backlink = cp.empty((rows, cols), dtype=cp.int8)
+    _backlink_kernel[blocks, THREADS](d_cost, dist, backlink, cell_size)
+    return cp.asnumpy(dist), cp.asnumpy(backlink)
@@ -1,9 +1,23 @@
+import concurrent.futures
+import json
 import math
 import os
+import tempfile
+import time
 import arcpy
-import requests
-from arcpy.sa import CostDistance, CostPathAsPolyline
-from arcpy.sa import Con, IsNull, Raster, Reclassify, RemapRange, Slope, Aspect, Abs, Mod
+import numpy as np
+from rasterio.features import rasterize
+from rasterio.transform import from_origin
+
+from fast_cost import (
+    aspect_from_gradient,
+    cost_distance,
+    fuse_cost,
+    horn_gradient,
+    shortest_path,
+    slope_from_gradient,
+    trace_path,
+)
 
 # ==========================================
 # FUNKCJE POMOCNICZE (MATEMATYKA I PARSOWANIE)
@@ -46,17 +60,74 @@ def wind_factor(wind_speed, wind_deg, route_bearing):
     return max(0.6, 1.0 + (wind_speed / 15.0) * (angle_diff / 180.0))
 
 
+def xy_to_cell(point_xy, lower_left, cell_size, shape):
+    """
+    Przelicza współrzędne terenowe X, Y na indeks komórki (wiersz, kolumna) tablicy NumPy.
+    lower_left: narożnik lewy dolny rastra (XMin, YMin), shape: (liczba wierszy, liczba kolumn).
+    Wiersz 0 tablicy odpowiada północnej krawędzi rastra.
+    """
+    rows, cols = shape
+    col = int(math.floor((point_xy[0] - lower_left[0]) / cell_size))
+    row = rows - 1 - int(math.floor((point_xy[1] - lower_left[1]) / cell_size))
+    if not (0 <= row < rows and 0 <= col < cols):
+        raise ValueError(f"Punkt {point_xy} leży poza zasięgiem rastra kosztów")
+    return row, col
+
+
+def cell_to_xy(row, col, lower_left, cell_size, rows):
+    """
+    Przelicza indeks komórki (wiersz, kolumna) na współrzędne X, Y jej środka.
+    """
+    x = lower_left[0] + (col + 0.5) * cell_size
+    y = lower_left[1] + (rows - row - 0.5) * cell_size
+    return x, y
+
+
 # ==========================================
 # INTEGRACJA Z ZEWNĘTRZNYM API (POGODA)
 # ==========================================
 
+# Czas ważności zapamiętanych danych pogodowych (sekundy)
+WEATHER_CACHE_TTL = 600
+
+# Sesja HTTP współdzielona między wywołaniami (ponowne użycie połączenia TCP/TLS)
+_http_session = None
+
+
+def get_http_session():
+    """
+    Zwraca współdzieloną sesję requests, tworząc ją przy pierwszym użyciu.
+    Biblioteka requests jest importowana dopiero tutaj - bez klucza API
+    (brak zapytań do sieci) skrypt nie ponosi kosztu jej importu.
+    """
+    global _http_session
+    if _http_session is None:
+        import requests
+        _http_session = requests.Session()
+    return _http_session
+
+
 def get_lublin_weather(api_key):
     """
     Pobiera aktualną pogodę dla Lublina z serwisu OpenWeatherMap.
-    Zwraca prędkość wiatru (m/s) i kierunek (stopnie).
+    Zwraca (prędkość wiatru m/s, kierunek w stopniach, błąd): przy nieudanym pobraniu
+    wiatr wynosi 0, a błąd to opis problemu (w przeciwnym razie None). Funkcja działa
+    w wątku roboczym, więc nie wysyła komunikatów geoprocessingu - robi to wywołujący.
+    Wynik jest zapamiętywany w pliku tymczasowym na WEATHER_CACHE_TTL sekund,
+    więc kolejne trasy liczone w tym czasie nie odpytują API.
     """
-    if not api_key or requests is None:
-        return 0.0, 0.0
+    if not api_key:
+        return 0.0, 0.0, None
+
+    cache_path = os.path.join(tempfile.gettempdir(), "lublin_wx.json")
+    try:
+        if time.time() - os.path.getmtime(cache_path) < WEATHER_CACHE_TTL:
+            with open(cache_path, encoding="utf-8") as f:
+                cached = json.load(f)
+            return float(cached["speed"]), float(cached["deg"]), None
+    except (OSError, ValueError, KeyError):
+        # Brak pliku lub uszkodzona zawartość - pobieramy dane od nowa
+        pass
 
     url = (
         "https://api.openweathermap.org/data/2.5/weather"
@@ -64,146 +135,280 @@ def get_lublin_weather(api_key):
     )
     try:
         # Timeout 10s zapobiega zawieszeniu skryptu przy braku sieci
-        data = requests.get(url, timeout=10).json()
-        wind_speed = float(data.get("wind", {}).get("speed", 0.0))
-        wind_deg = float(data.get("wind", {}).get("deg", 0.0))
-        return wind_speed, wind_deg
+        response = get_http_session().get(url, timeout=10)
+        # Błąd HTTP (np. 401 - zły klucz, 429 - limit zapytań) nie może trafić do pamięci
+        # podręcznej jako wiatr 0 m/s
+        response.raise_for_status()
+        wind = response.json().get("wind")
+        if not wind or "speed" not in wind:
+            raise ValueError("odpowiedź API nie zawiera danych o wietrze")
+        wind_speed = float(wind["speed"])
+        # Przy ciszy OpenWeatherMap może pominąć kierunek wiatru
+        wind_deg = float(wind.get("deg", 0.0))
     except Exception as e:
-        arcpy.AddWarning(f"Nie udało się pobrać pogody: {e}. Przyjęto wiatr 0 m/s.")
-        return 0.0, 0.0
+        return 0.0, 0.0, str(e)
+
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"speed": wind_speed, "deg": wind_deg}, f)
+    except OSError:
+        pass
+    return wind_speed, wind_deg, None
 
 
 # ==========================================
 # OPERACJE NA GEOBAZIE I GEOMETRII (GIS)
 # ==========================================
 
-def create_point_fc(output_gdb, nmt_raster, name, point_xy):
+def create_path_fc(output_gdb, name, path_rows, path_cols, lower_left, cell_size, rows, spatial_ref):
     """
-    Tworzy fizyczną warstwę punktową (Feature Class) w geobazie na podstawie współrzędnych X, Y.
+    Zapisuje ścieżkę wyznaczoną na siatce rastra (kolejne wiersze i kolumny komórek)
+    jako warstwę liniową (polyline) w geobazie.
     """
     fc_path = os.path.join(output_gdb, name)
-    
-    # Usuwamy starą warstwę, jeśli istnieje
     if arcpy.Exists(fc_path):
         arcpy.management.Delete(fc_path)
 
-    # Pobieramy układ współrzędnych z rastra wysokościowego (NMT), aby punkty pasowały do mapy
-    spatial_ref = arcpy.Describe(nmt_raster).spatialReference
-    
     arcpy.management.CreateFeatureclass(
-        output_gdb, name, "POINT", spatial_reference=spatial_ref
+        output_gdb, name, "POLYLINE", spatial_reference=spatial_ref
     )
-    arcpy.management.AddField(fc_path, "Name", "TEXT")
-    
-    # Wstawiamy punkt do nowej warstwy używając kursora
-    with arcpy.da.InsertCursor(fc_path, ["SHAPE@", "Name"]) as cursor:
-        point = arcpy.Point(point_xy[0], point_xy[1])
-        cursor.insertRow([arcpy.PointGeometry(point, spatial_ref), name])
-        
-    return fc_path
-
-
-# ==========================================
-# GŁÓWNA LOGIKA ANALIZY PRZESTRZENNEJ
-# ==========================================
 
-def build_cost_raster(
-    nmt_raster,
-    buildings_fc,
-    output_gdb,
-    wind_speed,
-    wind_deg,
-    penalty,
-    vegetation_raster,
-    vegetation_penalty=3.0,
-):
-    """
-    Tworzy raster kosztu (Cost Surface). Każda komórka rastra otrzymuje wartość
-    reprezentującą trudność przelotu przez ten obszar.
-    """
+    # Linia przechodzi przez środki kolejnych komórek ścieżki
+    vertices = arcpy.Array()
+    for row, col in zip(path_rows, path_cols):
+        x, y = cell_to_xy(row, col, lower_left, cell_size, rows)
+        vertices.add(arcpy.Point(x, y))
 
-    arcpy.CheckOutExtension("Spatial")
+    # Jeden zapis całej geometrii kursorem
+    with arcpy.da.InsertCursor(fc_path, ["SHAPE@"]) as cursor:
+        cursor.insertRow([arcpy.Polyline(vertices, spatial_ref)])
 
-    nmt = Raster(nmt_raster)
-    
-    # Ustawienie środowiska analizy (snapowanie do siatki rastra)
-    arcpy.env.snapRaster = nmt
-    arcpy.env.cellSize = nmt.meanCellWidth
+    return fc_path
 
-    slope = Slope(nmt, "DEGREE")
-    aspect = Aspect(nmt)
-    
-    # Reklasyfikacja nachylenia: im stromiej, tym wyższy koszt (1, 2, 4, 8)
-    slope_cost = Reclassify(
-        slope,
-        "VALUE",
-        RemapRange([[0, 5, 1], [5, 15, 2], [15, 30, 4], [30, 90, 8]]),
-    )
 
-    # 2. Obsługa budynków, tworzenie strefy buforowej
-    buildings_buffer = os.path.join(output_gdb, "buildings_buffer_10m")
+def buffer_buildings(buildings_fc):
+    """
+    Tworzy strefę buforową 10 m wokół budynków (jeden, scalony poligon)
+    w przestrzeni roboczej "memory" - bufor służy tylko do rasteryzacji.
+    """
+    buildings_buffer = os.path.join("memory", "buildings_buffer_10m")
     if arcpy.Exists(buildings_buffer):
         arcpy.management.Delete(buildings_buffer)
 
-    # Bufor 10m wokół każdego budynku
     arcpy.analysis.Buffer(
         buildings_fc,
         buildings_buffer,
         "10 Meters",
         dissolve_option="ALL",
     )
+    return buildings_buffer
 
-    # Konwersja buforów (poligonów) na raster, aby można je było dodać do mapy kosztów
-    buildings_raster = os.path.join(output_gdb, "buildings_r")
-    if arcpy.Exists(buildings_raster):
-        arcpy.management.Delete(buildings_raster)
 
-    oid_field = arcpy.Describe(buildings_buffer).OIDFieldName
-    arcpy.conversion.PolygonToRaster(
-        buildings_buffer, oid_field, buildings_raster, cellsize=nmt.meanCellWidth
-    )
+def resample_to_grid(raster, nmt_raster, cell_size, extent):
+    """
+    Dopasowuje raster (NMPT) do siatki NMT - rozmiaru komórki, wyrównania i zasięgu -
+    aby komórki tablic NMT i NMPT o tych samych indeksach opisywały ten sam teren.
+    Jeśli raster ma już siatkę NMT, zwracany jest bez zmian; w przeciwnym razie
+    wynik przepróbkowania trafia do przestrzeni roboczej "memory".
+    """
+    desc = arcpy.Describe(raster)
+    if (
+        math.isclose(desc.meanCellWidth, cell_size)
+        and math.isclose(desc.meanCellHeight, cell_size)
+        and math.isclose(desc.extent.XMin, extent.XMin)
+        and math.isclose(desc.extent.YMin, extent.YMin)
+    ):
+        return raster
+
+    resampled = os.path.join("memory", "nmpt_resampled")
+    if arcpy.Exists(resampled):
+        arcpy.management.Delete(resampled)
+    # Metoda najbliższego sąsiada - tak jak niejawne przepróbkowanie w algebrze map
+    with arcpy.EnvManager(snapRaster=nmt_raster, extent=extent):
+        arcpy.management.Resample(raster, resampled, f"{cell_size} {cell_size}", "NEAREST")
+    return resampled
+
+
+def rasterize_buildings(buildings_buffer, lower_left, cell_size, shape):
+    """
+    Rasteryzuje strefy buforowe budynków bezpośrednio do maski NumPy (1 - budynek, 0 - brak)
+    dopasowanej do siatki NMT, bez zapisu rastra do geobazy.
+    """
+    rows, cols = shape
+    # Transformacja afiniczna siatki: narożnik lewy górny i rozmiar komórki
+    transform = from_origin(lower_left[0], lower_left[1] + rows * cell_size, cell_size, cell_size)
+
+    with arcpy.da.SearchCursor(buildings_buffer, ["SHAPE@"]) as cursor:
+        shapes = [(row[0].__geo_interface__, 1) for row in cursor if row[0] is not None]
 
-    # 3. Wpływ wiatru
+    if not shapes:
+        return np.zeros(shape, dtype=np.uint8)
+    return rasterize(shapes, out_shape=shape, transform=transform, fill=0, dtype="uint8")
+
+
+# ==========================================
+# PAMIĘĆ PODRĘCZNA NACHYLENIA I EKSPOZYCJI
+# ==========================================
+
+# Pliki zapisywane obok geobazy wynikowej: tablice .npy i opis NMT, z którego powstały
+TERRAIN_CACHE_NAMES = ("slope_cache", "aspect_cache")
+TERRAIN_CACHE_META = "terrain_cache.json"
+# Wersja algorytmu nachylenia/ekspozycji - podniesienie unieważnia zapisane tablice
+TERRAIN_CACHE_VERSION = 2
+
+
+def terrain_cache_key(nmt_raster, cell_size):
+    """
+    Klucz ważności zapamiętanego nachylenia i ekspozycji: wersja algorytmu, ścieżka NMT,
+    czas jego modyfikacji i rozmiar komórki. Zwraca None, gdy NMT nie jest plikiem na dysku
+    (np. raster w geobazie) - wtedy pamięć podręczna nie jest używana.
+    """
+    if not os.path.isfile(nmt_raster):
+        return None
+    return {
+        "version": TERRAIN_CACHE_VERSION,
+        "nmt": os.path.abspath(nmt_raster),
+        "mtime": os.path.getmtime(nmt_raster),
+        "cell_size": cell_size,
+    }
+
+
+def load_terrain_cache(cache_dir, key, name):
+    """
+    Zwraca zapamiętaną tablicę (name: "slope_cache" lub "aspect_cache") lub None,
+    jeśli jej brak albo została policzona dla innej wersji NMT.
+    """
+    if key is None:
+        return None
+    try:
+        with open(os.path.join(cache_dir, TERRAIN_CACHE_META), encoding="utf-8") as f:
+            if json.load(f) != key:
+                return None
+        return np.load(os.path.join(cache_dir, name + ".npy"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_terrain_cache(cache_dir, key, name, array):
+    """
+    Zapisuje tablicę do pamięci podręcznej (float32 - połowa rozmiaru pliku). Jeśli opis w pliku JSON dotyczy innego NMT,
+    nieaktualne tablice są najpierw usuwane, aby nie zostały użyte z nowym kluczem.
+    Błędy zapisu są pomijane - pamięć podręczna jest tylko optymalizacją.
+    """
+    if key is None:
+        return
+    meta_path = os.path.join(cache_dir, TERRAIN_CACHE_META)
+    try:
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                current = json.load(f)
+        except (OSError, ValueError):
+            current = None
+        if current != key:
+            for stale in TERRAIN_CACHE_NAMES:
+                stale_path = os.path.join(cache_dir, stale + ".npy")
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(key, f)
+        np.save(os.path.join(cache_dir, name + ".npy"), array.astype(np.float32, copy=False))
+    except OSError:
+        pass
+
+
+# ==========================================
+# GŁÓWNA LOGIKA ANALIZY PRZESTRZENNEJ
+# ==========================================
+
+def build_cost_raster(
+    nmt_raster,
+    buildings_fc,
+    vegetation_raster,
+    wind_future,
+    penalty,
+    vegetation_penalty,
+    extent,
+    cell_size,
+    cache_dir,
+):
+    """
+    Tworzy raster kosztu (Cost Surface) jako tablicę NumPy w siatce NMT. Każda komórka
+    otrzymuje wartość reprezentującą trudność przelotu przez ten obszar.
+    Wszystkie obliczenia odbywają się w pamięci, bez zapisu rastrów pośrednich
+    (poza przepróbkowaniem NMPT do siatki NMT w przestrzeni "memory", jeśli jest potrzebne).
+    wind_future: obiekt Future zwracający (prędkość, kierunek, błąd) wiatru - na wynik
+    czekamy dopiero tuż przed sklejeniem kosztów.
+    cache_dir: katalog pamięci podręcznej nachylenia i ekspozycji - dopóki plik NMT
+    się nie zmienia, obie tablice są wczytywane zamiast liczone od nowa.
+    """
+    # 1. Nachylenie i ekspozycja terenu (metoda Horna, jak w narzędziach Slope i Aspect)
+    dem = arcpy.RasterToNumPyArray(nmt_raster, nodata_to_value=np.nan).astype(np.float64)
+    rows, cols = dem.shape
+    lower_left = (extent.XMin, extent.YMin)
+    cache_key = terrain_cache_key(nmt_raster, cell_size)
+    dzdx = dzdy = None
+    slope = load_terrain_cache(cache_dir, cache_key, "slope_cache")
+    if slope is None:
+        dzdx, dzdy = horn_gradient(dem, cell_size)
+        # float32 jak w pamięci podręcznej - wynik nie zależy od tego, skąd pochodzi tablica
+        slope = slope_from_gradient(dzdx, dzdy).astype(np.float32)
+        save_terrain_cache(cache_dir, cache_key, "slope_cache", slope)
+
+    # 2. Obsługa budynków: strefy buforowe jako maska w siatce NMT
+    buildings_buffer = buffer_buildings(buildings_fc)
+    buildings_mask = rasterize_buildings(buildings_buffer, lower_left, cell_size, dem.shape)
+
+    # 3. Roślinność: NMPT zawiera korony drzew, NMT to grunt.
+    # NMPT może mieć inną rozdzielczość (np. 0.5 m przy NMT 1 m) - najpierw siatka NMT.
+    vegetation_grid = resample_to_grid(vegetation_raster, nmt_raster, cell_size, extent)
+    vegetation = arcpy.RasterToNumPyArray(
+        vegetation_grid,
+        arcpy.Point(*lower_left),
+        cols,
+        rows,
+        nodata_to_value=np.nan,
+    ).astype(np.float64)
+    if vegetation_grid != vegetation_raster:
+        arcpy.management.Delete(vegetation_grid)
+
+    # Dane pogodowe są potrzebne dopiero teraz - pobieranie trwało równolegle z obliczeniami
+    wind_speed, wind_deg, _ = wind_future.result()
+
+    # Ekspozycja jest potrzebna tylko do mnożnika wiatrowego - przy braku wiatru jej nie liczymy
     if wind_speed > 0:
-        # Obliczamy różnicę między ekspozycją stoku a kierunkiem wiatru
-        angle_diff = Abs(Mod(aspect - float(wind_deg) + 180.0, 360.0) - 180.0)
-        # Formuła: wiatr wiejący prostopadle do zbocza zwiększa turbulencje
-        wind_factor_raster = 1.0 + (float(wind_speed) / 15.0) * (angle_diff / 180.0)
-        # Ograniczenie dolne współczynnika
-        wind_factor_raster = Con(wind_factor_raster < 0.6, 0.6, wind_factor_raster)
-        base_cost = slope_cost * wind_factor_raster
+        aspect = load_terrain_cache(cache_dir, cache_key, "aspect_cache")
+        if aspect is None:
+            if dzdx is None:
+                dzdx, dzdy = horn_gradient(dem, cell_size)
+            aspect = aspect_from_gradient(dzdx, dzdy).astype(np.float32)
+            save_terrain_cache(cache_dir, cache_key, "aspect_cache", aspect)
     else:
-        base_cost = slope_cost
-        
-    # 4. Wpływ roślinności
-    # NMPT zawiera korony drzew, NMT to grunt.
-    vegetation = Raster(vegetation_raster)
-    vegetation_height = Con(IsNull(vegetation), 0, vegetation - nmt)
-    vegetation_height = Con(vegetation_height < 0, 0, vegetation_height)
-    
-    # Mnożnik kosztu rośnie wraz z wysokością roślinności
-    vegetation_multiplier = 1.0 + (vegetation_height * float(vegetation_penalty))
-    base_cost = base_cost * vegetation_multiplier
-
-    # 5. Finalne sklejenie kosztów
-    # Jeśli komórka pokrywa się z budynkiem (IsNull jest False), nałóż ogromną karę (penalty).
-    # W przeciwnym razie użyj obliczonego kosztu bazowego.
-    cost_raster = Con(
-        IsNull(buildings_raster),
-        base_cost,
-        base_cost * float(penalty),
+        aspect = np.empty((0, 0), dtype=np.float32)
+
+    # 4. Sklejenie kosztów w jednym równoległym przejściu:
+    # nachylenie (1, 2, 4, 8) * wiatr * roślinność * kara za budynki (penalty)
+    cost = np.empty_like(dem)
+    fuse_cost(
+        dem,
+        aspect,
+        slope,
+        vegetation,
+        buildings_mask,
+        float(wind_speed),
+        float(wind_deg),
+        float(penalty),
+        float(vegetation_penalty),
+        cost,
     )
+    return cost
 
-    # Zapis wynikowego rastra kosztu na dysku
-    cost_output = os.path.join(output_gdb, "cost_surface")
-    cost_raster.save(cost_output)
-    return cost_output
 
-
-def create_3d_path(nmt_raster, path_2d, output_gdb, altitude_offset=0.0):
+def create_3d_path(nmt_raster, path_2d, output_gdb, cell_size, extent, spatial_ref, altitude_offset=0.0):
     """
     Konwertuje płaską trasę (2D) na linię trójwymiarową (3D), przyklejając ją do terenu.
     Dodatkowo podnosi trasę o zadaną wysokość przelotu (altitude_offset).
+    cell_size, extent, spatial_ref: metadane NMT (odczytane raz w compute_path).
+    Rozszerzenie 3D musi być wypożyczone przez wywołującego (compute_path).
     """
     output_3d = os.path.join(output_gdb, "drone_path_3d")
     if arcpy.Exists(output_3d):
@@ -215,35 +420,29 @@ def create_3d_path(nmt_raster, path_2d, output_gdb, altitude_offset=0.0):
     prev_extent = arcpy.env.extent
     
     try:
-        arcpy.CheckOutExtension("3D")
-        arcpy.CheckOutExtension("Spatial")
-        nmt = Raster(nmt_raster)
-        
         # Tymczasowa zmiana środowiska dla poprawności interpolacji
         with arcpy.EnvManager(
             snapRaster=nmt_raster,
-            cellSize=nmt.meanCellWidth,
-            extent=nmt.extent,
+            cellSize=cell_size,
+            extent=extent,
         ):
-            # Jeśli zdefiniowano wysokość przelotu (np. 30m nad ziemią)
-            if altitude_offset:
-                temp_surface = os.path.join(output_gdb, "nmt_offset")
-                if arcpy.Exists(temp_surface):
-                    arcpy.management.Delete(temp_surface)
-                
-                # Dodajemy stałą wartość (np. 30) do każdej komórki NMT
-                (nmt + float(altitude_offset)).save(temp_surface)
-                
-                # InterpolateShape tworzy geometrię 3D (Z-aware) na podstawie powierzchni
-                arcpy.ddd.InterpolateShape(temp_surface, path_2d, output_3d)
-                
-                # Sprzątanie pliku tymczasowego
-                if arcpy.Exists(temp_surface):
-                    arcpy.management.Delete(temp_surface)
-            else:
-                # Trasa bezpośrednio na ziemi (0m AGL)
-                arcpy.ddd.InterpolateShape(nmt_raster, path_2d, output_3d)
-                
+            # InterpolateShape tworzy geometrię 3D (Z-aware) na podstawie powierzchni NMT
+            arcpy.ddd.InterpolateShape(nmt_raster, path_2d, output_3d)
+
+        # Jeśli zdefiniowano wysokość przelotu (np. 30m nad ziemią), przesuwamy Z
+        # wierzchołków o stałą wartość - bez tworzenia podniesionej kopii całego NMT
+        if altitude_offset:
+            offset = float(altitude_offset)
+            with arcpy.da.UpdateCursor(output_3d, ["SHAPE@"]) as cursor:
+                for (shape,) in cursor:
+                    parts = arcpy.Array(
+                        [
+                            arcpy.Array([arcpy.Point(p.X, p.Y, p.Z + offset) for p in part])
+                            for part in shape
+                        ]
+                    )
+                    cursor.updateRow([arcpy.Polyline(parts, spatial_ref, True, False)])
+
         return output_3d
     except Exception as exc:
         arcpy.AddWarning(f"Nie udało się utworzyć trasy 3D: {exc}")
@@ -271,57 +470,105 @@ def compute_path(
     altitude_offset=30.0,
     vegetation_raster=None,
     vegetation_penalty=3.0,
+    backend="cpu",
+    max_cost=None,
     ):
     """
     Funkcja zarządzająca całym procesem:
     1. Pobiera pogodę.
     2. Buduje raster kosztów.
-    3. Konwertuje współrzędne start/stop na punkty.
-    4. Oblicza najtańszą trasę (CostDistance + CostPath).
+    3. Przelicza współrzędne start/stop na komórki rastra.
+    4. Oblicza najtańszą trasę (dwukierunkowy Dijkstra na tablicy NumPy).
     5. Generuje wersję 3D trasy.
+    backend: "cpu" (Numba) lub "cuda" (delta-stepping na GPU, wymaga CuPy).
+    max_cost: maksymalny koszt dotarcia; jeśli podany, odległość kosztowa jest liczona
+    tylko w zasięgu max_cost (dla "cpu" jednym ograniczonym przebiegiem Dijkstry).
     """
-    arcpy.env.workspace = workspace
-    arcpy.env.overwriteOutput = True # Pozwala nadpisywać pliki
-
-    wind_speed, wind_deg = get_lublin_weather(api_key)
-    arcpy.AddMessage(f"Warunki pogodowe - Wiatr: {wind_speed} m/s, Kierunek: {wind_deg}")
+    if backend not in ("cpu", "cuda"):
+        raise ValueError(f"Nieznany backend obliczeń: {backend}")
+    max_cost = math.inf if max_cost is None else float(max_cost)
 
-    # Tworzenie mapy trudności przelotu
-    cost_surface = build_cost_raster(
-        nmt_raster,
-        buildings_fc,
-        output_gdb,
-        wind_speed,
-        wind_deg,
-        penalty,
-        vegetation_raster,
-        vegetation_penalty,
-    )
-    
-    # Tworzenie punktów startowego i końcowego
-    start_fc = create_point_fc(output_gdb, nmt_raster, "start_pt", start_xy)
-    end_fc = create_point_fc(output_gdb, nmt_raster, "end_pt", end_xy)
-
-    arcpy.CheckOutExtension("Spatial")
+    # Licencja rozszerzenia 3D wypożyczana raz na całe wywołanie (każde wypożyczenie
+    # to zapytanie do serwera licencji) i zwracana także w przypadku błędu
+    arcpy.CheckOutExtension("3D")
+    try:
+        arcpy.env.workspace = workspace
+        arcpy.env.overwriteOutput = True # Pozwala nadpisywać pliki
+
+        # Jednorazowy odczyt metadanych NMT (układ współrzędnych, rozdzielczość, zasięg)
+        desc = arcpy.Describe(nmt_raster)
+        spatial_ref = desc.spatialReference
+        cell_size = desc.meanCellWidth
+        extent = desc.extent
+
+        # Tworzenie mapy trudności przelotu (tablica NumPy w siatce NMT).
+        # Pogoda jest pobierana w osobnym wątku, równolegle z obliczaniem nachylenia i buforów.
+        lower_left = (extent.XMin, extent.YMin)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            wind_future = executor.submit(get_lublin_weather, api_key)
+            cost_arr = build_cost_raster(
+                nmt_raster,
+                buildings_fc,
+                vegetation_raster,
+                wind_future,
+                penalty,
+                vegetation_penalty,
+                extent,
+                cell_size,
+                os.path.dirname(os.path.abspath(output_gdb)),
+            )
+
+        # Komunikaty dopiero w głównym wątku narzędzia (nie w wątku pobierającym pogodę)
+        wind_speed, wind_deg, weather_error = wind_future.result()
+        if weather_error:
+            arcpy.AddWarning(f"Nie udało się pobrać pogody: {weather_error}. Przyjęto wiatr 0 m/s.")
+        arcpy.AddMessage(f"Warunki pogodowe - Wiatr: {wind_speed} m/s, Kierunek: {wind_deg}")
+
+        # Start i cel trafiają do jąder bezpośrednio jako indeksy komórek (wiersz, kolumna)
+        start_rc = xy_to_cell(start_xy, lower_left, cell_size, cost_arr.shape)
+        end_rc = xy_to_cell(end_xy, lower_left, cell_size, cost_arr.shape)
+
+        if backend == "cpu" and math.isinf(max_cost):
+            # Dwukierunkowy Dijkstra: przeszukiwanie od startu i od celu jednocześnie
+            path = shortest_path(cost_arr, start_rc, end_rc)
+            if path is None:
+                raise ValueError("Punkt końcowy jest nieosiągalny z punktu startowego")
+            path_rows, path_cols = path
+        else:
+            # Pełna mapa odległości kosztowej od startu i raster kierunkowy
+            src_r = np.array([start_rc[0]], dtype=np.int64)
+            src_c = np.array([start_rc[1]], dtype=np.int64)
+            if backend == "cuda":
+                # Import na żądanie - CuPy jest wymagane tylko dla obliczeń na GPU
+                from gpu_cost import dijkstra_cuda
+                dist, back_link = dijkstra_cuda(cost_arr, src_r, src_c, cell_size, max_cost)
+            else:
+                dist, back_link = cost_distance(cost_arr, src_r, src_c, cell_size, max_cost)
+            if not np.isfinite(dist[end_rc]):
+                raise ValueError("Punkt końcowy jest nieosiągalny z punktu startowego")
 
-    # Obliczanie odległości kosztowej (mapa odległości od startu uwzględniająca trudność)
-    cost_dist = os.path.join(output_gdb, "cost_distance")
-    back_link = os.path.join(output_gdb, "back_link") # Raster kierunkowy potrzebny do wyznaczenia ścieżki
-    
-    cost_distance = CostDistance(start_fc, cost_surface, out_backlink_raster=back_link)
-    cost_distance.save(cost_dist)
+            # Wyznaczenie najtańszej ścieżki (linii 2D) od punktu startowego do końcowego
+            path_rows, path_cols = trace_path(back_link, end_rc[0], end_rc[1])
 
-    output_path = os.path.join(output_gdb, "drone_path")
-    if arcpy.Exists(output_path):
-        arcpy.management.Delete(output_path)
+        output_path = create_path_fc(
+            output_gdb,
+            "drone_path",
+            path_rows,
+            path_cols,
+            lower_left,
+            cell_size,
+            cost_arr.shape[0],
+            spatial_ref,
+        )
 
-    # Wyznaczenie najtańszej ścieżki (linii 2D) od punktu końcowego do startowego
-    CostPathAsPolyline(end_fc, cost_dist, back_link, output_path)
-    
-    # Konwersja do 3D
-    output_3d = create_3d_path(nmt_raster, output_path, output_gdb, altitude_offset)
+        # Konwersja do 3D
+        output_3d = create_3d_path(
+            nmt_raster, output_path, output_gdb, cell_size, extent, spatial_ref, altitude_offset
+        )
     
-    return output_3d or output_path
+        return output_3d or output_path
+    finally:
+        arcpy.CheckInExtension("3D")
 
 
 # ==========================================
@@ -342,8 +589,8 @@ def main():
     
     altitude_offset_text = arcpy.GetParameterAsText(7) # Wysokość lotu drona
     
-    # Klucz API (dla bezpieczeństwa w produkcji powinien być w zmiennych środowiskowych)
-    api_key = "1d490f98beea0754ca8a15bfc848c685"
+    # Klucz API OpenWeatherMap ze zmiennej środowiskowej (brak klucza -> wiatr 0 m/s)
+    api_key = os.environ.get("OWM_API_KEY")
 
     try:
         # Parsowanie współrzędnych tekstowych na liczby
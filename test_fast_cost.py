@@ -0,0 +1,251 @@
+import heapq
+import math
+
+import numpy as np
+import pytest
+
+from fast_cost import (
+    COST_SCALE,
+    DC,
+    DIAL_MAX_BUCKETS,
+    DR,
+    _max_edge_weight,
+    aspect_from_gradient,
+    cost_distance,
+    fuse_cost,
+    horn_gradient,
+    quantize_cost,
+    shortest_path,
+    trace_path,
+)
+
+# ==========================================
+# ALGORYTM WZORCOWY (CZYSTY PYTHON, BEZ KWANTYZACJI)
+# ==========================================
+
+def reference_dist(cost, src, cell_size=1.0):
+    """Dijkstra na heapq z tym samym kosztem krawędzi co CostDistance: 0.5 * (cu + cv) * d."""
+    rows, cols = cost.shape
+    dist = np.full(cost.shape, np.inf)
+    if not np.isfinite(cost[src]):
+        return dist
+    dist[src] = 0.0
+    heap = [(0.0, src)]
+    while heap:
+        d, (r, c) = heapq.heappop(heap)
+        if d > dist[r, c]:
+            continue
+        for k in range(8):
+            nr, nc = r + DR[k], c + DC[k]
+            if 0 <= nr < rows and 0 <= nc < cols and np.isfinite(cost[nr, nc]):
+                geo = cell_size * (math.sqrt(2.0) if DR[k] and DC[k] else 1.0)
+                nd = d + 0.5 * (cost[r, c] + cost[nr, nc]) * geo
+                if nd < dist[nr, nc]:
+                    dist[nr, nc] = nd
+                    heapq.heappush(heap, (nd, (nr, nc)))
+    return dist
+
+
+def path_cost(cost, rows, cols, cell_size=1.0):
+    """Koszt ścieżki podanej jako kolejne wiersze i kolumny komórek."""
+    total = 0.0
+    for i in range(1, len(rows)):
+        assert max(abs(rows[i] - rows[i - 1]), abs(cols[i] - cols[i - 1])) == 1
+        geo = cell_size * (math.sqrt(2.0) if rows[i] != rows[i - 1] and cols[i] != cols[i - 1] else 1.0)
+        total += 0.5 * (cost[rows[i], cols[i]] + cost[rows[i - 1], cols[i - 1]]) * geo
+    return total
+
+
+def random_case(seed, low, high):
+    """Losowy raster kosztów z przeszkodami (Inf) oraz przekraczalne komórki startu i celu."""
+    rng = np.random.default_rng(seed)
+    rows, cols = rng.integers(8, 40, 2)
+    cost = rng.uniform(low, high, (rows, cols))
+    cost[rng.random((rows, cols)) < 0.2] = np.inf
+    start = (int(rng.integers(rows)), int(rng.integers(cols)))
+    end = (int(rng.integers(rows)), int(rng.integers(cols)))
+    cost[start] = low
+    cost[end] = low
+    return cost, start, end
+
+
+def fuse(dem, slope, aspect=None, veg=None, wind_speed=0.0, wind_deg=0.0, vp=0.1):
+    """fuse_cost bez budynków; brak aspect lub veg oznacza płaski teren bez roślinności."""
+    dem = np.asarray(dem, dtype=np.float64)
+    if aspect is None:
+        aspect = np.full(dem.shape, -1.0, dtype=np.float32)
+    if veg is None:
+        veg = np.full(dem.shape, np.nan)
+    out = np.empty_like(dem)
+    fuse_cost(
+        dem,
+        np.asarray(aspect, dtype=np.float32),
+        np.asarray(slope, dtype=np.float32),
+        np.asarray(veg, dtype=np.float64),
+        np.zeros(dem.shape, dtype=np.uint8),
+        wind_speed,
+        wind_deg,
+        1000.0,
+        vp,
+        out,
+    )
+    return out
+
+
+# Zakresy kosztów: (0.6, 1.4) i (0.6, 20) mieszczą się w kolejce Dial (koszt komórki
+# do ok. 23), (0.6, 8000) wymusza kopiec binarny
+COST_RANGES = [(0.6, 1.4), (0.6, 20.0), (0.6, 8000.0)]
+
+# Największy koszt komórki, przy którym shortest_path wybiera kolejkę Dial
+DIAL_COST_LIMIT = (DIAL_MAX_BUCKETS - 2) / (2.0 * math.sqrt(2.0) * COST_SCALE)
+
+
+# ==========================================
+# TESTY
+# ==========================================
+
+def test_slope_classes_follow_remap_range_boundaries():
+    # Wartość równa progowi należy do niższej klasy (jak RemapRange "0 5 1; 5 15 2; ...")
+    slope = np.array([[0.0, 5.0, 5.001, 15.0, 15.001, 30.0, 30.001, 89.0]])
+    cost = fuse(np.zeros(slope.shape), slope)
+    assert cost.tolist() == [[1.0, 1.0, 2.0, 2.0, 4.0, 4.0, 8.0, 8.0]]
+
+
+def test_aspect_points_downhill_from_north():
+    rows, cols = np.mgrid[0:6, 0:6].astype(np.float64)
+    # Wiersz 0 to północ: teren opadający na północ i na wschód (wnętrze rastra)
+    north = aspect_from_gradient(*horn_gradient(rows, 1.0))[1:-1, 1:-1]
+    east = aspect_from_gradient(*horn_gradient(-cols, 1.0))[1:-1, 1:-1]
+    np.testing.assert_allclose(north, 0.0)
+    np.testing.assert_allclose(east, 90.0)
+    assert (aspect_from_gradient(*horn_gradient(np.ones((4, 4)), 1.0)) == -1.0).all()
+
+
+def test_wind_multiplier_and_clamp():
+    aspect = np.array([[0.0, 90.0, 180.0, 270.0]])
+    dem = np.zeros(aspect.shape)
+    cost = fuse(dem, np.zeros(aspect.shape), aspect, wind_speed=15.0, wind_deg=0.0)
+    np.testing.assert_allclose(cost, [[1.0, 1.5, 2.0, 1.5]])
+    # Dla wiatru > 0 mnożnik nie spada poniżej 1, więc dolny próg 0.6 nigdy go nie obniża;
+    # ujemna prędkość (błędne dane) nie jest stosowana wcale
+    cost = fuse(dem, np.zeros(aspect.shape), aspect, wind_speed=-30.0, wind_deg=0.0)
+    assert (cost >= 0.6).all()
+    np.testing.assert_allclose(cost, 1.0)
+
+
+def test_nodata_in_dem_and_vegetation():
+    dem = np.array([[100.0, np.nan, 100.0, 100.0]])
+    veg = np.array([[np.nan, 120.0, 102.0, 90.0]])
+    cost = fuse(dem, np.zeros(dem.shape), veg=veg, vp=0.1)
+    # NaN NMT -> nieprzekraczalna, NaN NMPT lub korona poniżej gruntu -> bez kary
+    assert cost.tolist() == [[1.0, np.inf, pytest.approx(1.2), 1.0]]
+
+    # NaN nachylenia lub ekspozycji (przy wietrze) nie może dawać najtańszej komórki
+    cost = fuse(np.zeros((1, 2)), [[np.nan, 0.0]], [[0.0, np.nan]], wind_speed=5.0)
+    assert np.isinf(cost).all()
+
+
+def test_horn_gradient_fills_nodata_neighbours_with_centre():
+    dem = np.add.outer(np.arange(5.0), np.zeros(6))
+    dem[:, 3] = np.nan
+    dzdx, dzdy = horn_gradient(dem, 1.0)
+    valid = ~np.isnan(dem)
+    assert np.isfinite(dzdx[valid]).all() and np.isfinite(dzdy[valid]).all()
+    assert np.isnan(dzdx[~valid]).all()
+    # Daleko od NoData i od krawędzi rastra - dokładny spadek płaszczyzny
+    assert dzdy[2, 1] == pytest.approx(1.0)
+    assert dzdx[2, 1] == pytest.approx(0.0)
+    assert np.isfinite(fuse(dem, np.zeros(dem.shape))[valid]).all()
+
+
+def test_quantize_cost_marks_impassable_cells():
+    cost_q, scale = quantize_cost(np.array([[1.0, np.inf], [np.nan, 2.5]]))
+    assert scale == 1000.0
+    assert cost_q.tolist() == [[1000, -1], [-1, 2500]]
+
+
+@pytest.mark.parametrize("low, high", COST_RANGES)
+@pytest.mark.parametrize("seed", range(20))
+def test_shortest_path_matches_reference_cost(seed, low, high):
+    cost, start, end = random_case(seed, low, high)
+    expected = reference_dist(cost, start)[end]
+
+    result = shortest_path(cost, start, end)
+    if not np.isfinite(expected):
+        assert result is None
+        return
+    rows, cols = result
+    assert (rows[0], cols[0]) == start
+    assert (rows[-1], cols[-1]) == end
+    assert path_cost(cost, rows, cols) == pytest.approx(expected, rel=1e-3)
+
+
+@pytest.mark.parametrize("factor, dial", [(0.99, True), (1.01, False)])
+@pytest.mark.parametrize("seed", range(5))
+def test_shortest_path_near_dial_limit(seed, factor, dial):
+    cost, start, end = random_case(seed, 0.6, 1.0)
+    finite = np.isfinite(cost)
+    cost[finite] *= factor * DIAL_COST_LIMIT / cost[finite].max()
+    cost_q, _ = quantize_cost(cost)
+    assert (_max_edge_weight(cost_q) < DIAL_MAX_BUCKETS) == dial
+
+    expected = reference_dist(cost, start)[end]
+    result = shortest_path(cost, start, end)
+    if not np.isfinite(expected):
+        assert result is None
+        return
+    rows, cols = result
+    assert path_cost(cost, rows, cols) == pytest.approx(expected, rel=1e-3)
+
+
+def test_shortest_path_returns_none_for_unreachable_target():
+    cost = np.ones((10, 10))
+    cost[:, 5] = np.inf
+    assert shortest_path(cost, (2, 1), (7, 8)) is None
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_cost_distance_matches_reference(seed):
+    cost, start, end = random_case(seed, 0.6, 8.0)
+    expected = reference_dist(cost, start, cell_size=1.5)
+    dist, backlink = cost_distance(cost, np.array([start[0]]), np.array([start[1]]), 1.5)
+
+    reached = np.isfinite(expected)
+    assert np.array_equal(np.isfinite(dist), reached)
+    np.testing.assert_allclose(dist[reached], expected[reached], rtol=1e-3)
+    if reached[end]:
+        rows, cols = trace_path(backlink, end[0], end[1])
+        assert (rows[0], cols[0]) == start
+        assert path_cost(cost, rows, cols, 1.5) == pytest.approx(expected[end], rel=1e-3)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_cost_distance_respects_max_cost(seed):
+    cost, start, _ = random_case(seed, 0.6, 8.0)
+    expected = reference_dist(cost, start)
+    max_cost = float(np.median(expected[np.isfinite(expected)]))
+    dist, _ = cost_distance(cost, np.array([start[0]]), np.array([start[1]]), 1.0, max_cost)
+
+    # Z dala od granicy max_cost (poza błędem kwantyzacji) wynik jest jednoznaczny
+    inside = expected < 0.99 * max_cost
+    outside = expected > 1.01 * max_cost
+    np.testing.assert_allclose(dist[inside], expected[inside], rtol=1e-3)
+    assert np.isinf(dist[outside]).all()
+
+
+@pytest.mark.parametrize("bounded", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_cuda_distances_match_reference(seed, bounded):
+    pytest.importorskip("cupy")
+    from gpu_cost import dijkstra_cuda
+
+    cost, start, _ = random_case(seed, 0.6, 8.0)
+    expected = reference_dist(cost, start, cell_size=1.5)
+    max_cost = float(np.median(expected[np.isfinite(expected)])) if bounded else math.inf
+    dist, _ = dijkstra_cuda(cost, np.array([start[0]]), np.array([start[1]]), 1.5, max_cost)
+
+    # Bez kwantyzacji; komórka na samej granicy max_cost zależy od zaokrągleń sumy
+    inside = expected < (1.0 - 1e-9) * max_cost
+    outside = expected > (1.0 + 1e-9) * max_cost
+    np.testing.assert_allclose(dist[inside], expected[inside], rtol=1e-9)
+    assert np.isinf(dist[outside]).all()